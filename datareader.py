@@ -77,6 +77,13 @@ class YcbineoatReader:
     self.W = int(self.W*self.downscale)
     self.K[:2] *= self.downscale
 
+    if self.rgb_only:
+      # Shared zero-depth map for every frame; read-only so callers cannot corrupt it.
+      # torch.as_tensor still copies it to the GPU, but warns once per process that the
+      # NumPy array is not writable; callers that need to write must take a copy
+      self._zero_depth = np.zeros((self.H, self.W), dtype=np.float32)
+      self._zero_depth.setflags(write=False)
+
     self.gt_pose_files = sorted(glob.glob(f'{self.video_dir}/annotated_poses/*'))
 
     self.videoname_to_object = {
@@ -164,14 +171,13 @@ class YcbineoatReader:
         if mask[...,c].sum()>0:
           mask = mask[...,c]
           break
-    mask = cv2.resize(mask, (self.W,self.H), interpolation=cv2.INTER_NEAREST).astype(bool).astype(np.uint8)
-    return mask
+    mask = cv2.resize(mask, (self.W,self.H), interpolation=cv2.INTER_NEAREST)
+    return mask>0
 
   def get_depth(self,i):
     if self.rgb_only:
-      # Return zero-depth map for RGB-only mode
-      depth = np.zeros((self.H, self.W), dtype=np.float32)
-      return depth
+      # Return zero-depth map for RGB-only mode (shared, read-only)
+      return self._zero_depth
     depth = cv2.imread(self.color_files[i].replace('rgb','depth'),-1)/1e3
     depth = cv2.resize(depth, (self.W,self.H), interpolation=cv2.INTER_NEAREST)
     depth[(depth<0.001) | (depth>=self.zfar)] = 0
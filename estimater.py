@@ -26,6 +26,14 @@ class FoundationPose:
     if self.rgb_only_mode:
       logging.info("RGB-only mode enabled: depth maps will be set to zero, network will use RGB features only")
 
+    # Bind the mode-specific depth handling once instead of branching on every frame
+    if self.rgb_only_mode:
+      self._preprocess_depth = self._skip_depth_filtering
+      self._estimate_object_depth = self._estimate_object_depth_rgb
+    else:
+      self._preprocess_depth = self._filter_depth
+      self._estimate_object_depth = self._estimate_object_depth_rgbd
+
     self.reset_object(model_pts, model_normals, symmetry_tfs=symmetry_tfs, mesh=mesh)
     self.make_rotation_grid(min_n_views=40, inplane_step=60)
 
@@ -137,6 +145,36 @@ class FoundationPose:
     return ob_in_cams
 
 
+  def _filter_depth(self, depth):
+    depth = erode_depth(depth, radius=2, device='cuda')
+    depth = bilateral_filter_depth(depth, radius=2, device='cuda')
+    logging.info("depth processing done")
+    return depth
+
+
+  def _skip_depth_filtering(self, depth):
+    # Skip depth filtering in RGB-only mode (depth is already zero)
+    logging.info("RGB-only mode: skipping depth filtering")
+    return depth
+
+
+  def _estimate_object_depth_rgb(self, depth, mask):
+    # RGB-only mode: estimate depth from mesh scale and mask size
+    # Use mesh diameter as a rough scale estimate for depth
+    # This is a heuristic: assume object is at distance ~2-3x its diameter
+    estimated_depth = self.diameter * 2.5
+    logging.info(f"RGB-only mode: estimating depth as {estimated_depth:.4f} (mesh diameter: {self.diameter:.4f})")
+    return estimated_depth
+
+
+  def _estimate_object_depth_rgbd(self, depth, mask):
+    valid = mask.astype(bool) & (depth>=0.001)
+    if not valid.any():
+      logging.info(f"valid is empty")
+      return None
+    return np.median(depth[valid])
+
+
   def guess_translation(self, depth, mask, K):
     vs,us = np.where(mask>0)
     if len(us)==0:
@@ -144,19 +182,10 @@ class FoundationPose:
       return np.zeros((3))
     uc = (us.min()+us.max())/2.0
     vc = (vs.min()+vs.max())/2.0
-    
-    if self.rgb_only_mode:
-      # RGB-only mode: estimate depth from mesh scale and mask size
-      # Use mesh diameter as a rough scale estimate for depth
-      # This is a heuristic: assume object is at distance ~2-3x its diameter
-      estimated_depth = self.diameter * 2.5
-      logging.info(f"RGB-only mode: estimating depth as {estimated_depth:.4f} (mesh diameter: {self.diameter:.4f})")
-    else:
-      valid = mask.astype(bool) & (depth>=0.001)
-      if not valid.any():
-        logging.info(f"valid is empty")
-        return np.zeros((3))
-      estimated_depth = np.median(depth[valid])
+
+    estimated_depth = self._estimate_object_depth(depth, mask)
+    if estimated_depth is None:
+      return np.zeros((3))
 
     center = (np.linalg.inv(K)@np.asarray([uc,vc,1]).reshape(3,1))*estimated_depth
 
@@ -181,12 +210,7 @@ class FoundationPose:
       else:
         self.glctx = glctx
 
-    # Skip depth filtering in RGB-only mode (depth is already zero)
-    if not self.rgb_only_mode:
-      depth = erode_depth(depth, radius=2, device='cuda')
-      depth = bilateral_filter_depth(depth, radius=2, device='cuda')
-    else:
-      logging.info("RGB-only mode: skipping depth filtering")
+    depth = self._preprocess_depth(depth)
 
     if self.debug>=2:
       xyz_map = depth2xyzmap(depth, K)
@@ -296,13 +320,7 @@ class FoundationPose:
     logging.info("Welcome")
 
     depth = torch.as_tensor(depth, device='cuda', dtype=torch.float)
-    # Skip depth filtering in RGB-only mode (depth is already zero)
-    if not self.rgb_only_mode:
-      depth = erode_depth(depth, radius=2, device='cuda')
-      depth = bilateral_filter_depth(depth, radius=2, device='cuda')
-      logging.info("depth processing done")
-    else:
-      logging.info("RGB-only mode: skipping depth filtering")
+    depth = self._preprocess_depth(depth)
 
     xyz_map_torch = depth2xyzmap_batch(depth[None], torch.as_tensor(K, dtype=torch.float, device='cuda')[None], zfar=np.inf)[0]
     xyz_map = xyz_map_torch.data.cpu().numpy()
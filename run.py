@@ -12,6 +12,23 @@ from datareader import *
 import argparse
 from datetime import datetime
 import shutil
+import threading
+import json
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+def _scan_obj(d):
+  """
+  List the .obj files in directory d with a single scandir pass.
+
+  Returns:
+    list: Names of .obj files in d, or None if d is not a directory
+  """
+  try:
+    with os.scandir(d) as it:
+      return sorted(e.name for e in it if e.name.endswith('.obj') and e.is_file())
+  except (FileNotFoundError, NotADirectoryError):
+    return None
 
 
 def find_mesh_file(test_scene_dir, mesh_file=None):
@@ -38,46 +55,49 @@ def find_mesh_file(test_scene_dir, mesh_file=None):
   # Normalize test_scene_dir path
   test_scene_dir = os.path.abspath(test_scene_dir)
   
-  # Track searched locations for user feedback
+  # Scan each mesh directory once; the listings serve every pattern below
+  mesh_dir = os.path.join(test_scene_dir, 'mesh')
+  parent_mesh_dir = os.path.join(os.path.dirname(test_scene_dir), 'mesh')
+  mesh_objs = _scan_obj(mesh_dir)
+  parent_mesh_objs = _scan_obj(parent_mesh_dir)
+  
+  # Track searched locations (and whether they exist) for user feedback
   searched_locations = []
   
   # Try common patterns
   candidates = [
     # Pattern 1: {test_scene_dir}/mesh/textured_simple.obj (most common)
-    os.path.join(test_scene_dir, 'mesh', 'textured_simple.obj'),
+    (mesh_dir, mesh_objs),
     # Pattern 3: {test_scene_dir}/../mesh/textured_simple.obj (parent directory)
-    os.path.join(os.path.dirname(test_scene_dir), 'mesh', 'textured_simple.obj'),
+    (parent_mesh_dir, parent_mesh_objs),
   ]
   
   # Check Pattern 1 and Pattern 3 first
-  for candidate in candidates:
-    searched_locations.append(candidate)
-    if os.path.exists(candidate):
+  for cand_dir, objs in candidates:
+    candidate = os.path.join(cand_dir, 'textured_simple.obj')
+    exists = objs is not None and 'textured_simple.obj' in objs
+    searched_locations.append((candidate, exists))
+    if exists:
       logging.info(f"[OK] Auto-detected mesh file: {candidate}")
       return candidate
   
   # Pattern 2: Check if there's exactly one .obj file in mesh directory
-  mesh_dir = os.path.join(test_scene_dir, 'mesh')
-  searched_locations.append(f"{mesh_dir}/*.obj")
-  if os.path.isdir(mesh_dir):
-    obj_files = [f for f in os.listdir(mesh_dir) if f.endswith('.obj')]
-    if len(obj_files) == 1:
-      candidate = os.path.join(mesh_dir, obj_files[0])
+  searched_locations.append((f"{mesh_dir}/*.obj", mesh_objs is not None))
+  if mesh_objs is not None:
+    if len(mesh_objs) == 1:
+      candidate = os.path.join(mesh_dir, mesh_objs[0])
       logging.info(f"[OK] Auto-detected mesh file: {candidate}")
       return candidate
-    elif len(obj_files) > 1:
-      logging.warning(f"Found {len(obj_files)} .obj files in {mesh_dir}, cannot auto-select. Please specify --mesh_file")
-      logging.info(f"  Available mesh files: {', '.join(obj_files)}")
+    elif len(mesh_objs) > 1:
+      logging.warning(f"Found {len(mesh_objs)} .obj files in {mesh_dir}, cannot auto-select. Please specify --mesh_file")
+      logging.info(f"  Available mesh files: {', '.join(mesh_objs)}")
   
   # Check parent directory mesh folder
-  parent_mesh_dir = os.path.join(os.path.dirname(test_scene_dir), 'mesh')
-  searched_locations.append(f"{parent_mesh_dir}/*.obj")
-  if os.path.isdir(parent_mesh_dir):
-    obj_files = [f for f in os.listdir(parent_mesh_dir) if f.endswith('.obj')]
-    if len(obj_files) == 1:
-      candidate = os.path.join(parent_mesh_dir, obj_files[0])
-      logging.info(f"[OK] Auto-detected mesh file: {candidate}")
-      return candidate
+  searched_locations.append((f"{parent_mesh_dir}/*.obj", parent_mesh_objs is not None))
+  if parent_mesh_objs is not None and len(parent_mesh_objs) == 1:
+    candidate = os.path.join(parent_mesh_dir, parent_mesh_objs[0])
+    logging.info(f"[OK] Auto-detected mesh file: {candidate}")
+    return candidate
   
   # Provide helpful hints when mesh file cannot be found
   print("\n" + "="*70)
@@ -85,8 +105,7 @@ def find_mesh_file(test_scene_dir, mesh_file=None):
   print("="*70)
   print(f"Could not find mesh file for input directory: {test_scene_dir}\n")
   print("Searched locations:")
-  for i, loc in enumerate(searched_locations, 1):
-    exists = os.path.exists(loc) if not loc.endswith('/*.obj') else os.path.isdir(os.path.dirname(loc))
+  for i, (loc, exists) in enumerate(searched_locations, 1):
     status = "[EXISTS]" if exists else "[NOT FOUND]"
     print(f"  {i}. {loc} {status}")
   
@@ -144,6 +163,7 @@ if __name__=='__main__':
   parser.add_argument('--debug', type=int, default=1)
   parser.add_argument('--debug_dir', type=str, default=None, help='Output directory for debug files. Used only if --outputs is not provided.')
   parser.add_argument('--rgb_only', action='store_true', help='Enable RGB-only mode (no depth sensor required). Depth maps will be set to zero and network will use RGB features only.')
+  parser.add_argument('--show', action='store_true', help='Display the tracking visualization in a cv2.imshow window (requires a display).')
   args = parser.parse_args()
 
   set_logging_format()
@@ -187,16 +207,20 @@ if __name__=='__main__':
   debug = args.debug
   
   # Safely clear and recreate output directory
-  # Remove existing directory contents if it exists, then create subdirectories
+  # Move the existing directory aside (a single rename) and delete it in the background,
+  # so a large ob_in_cam/track_vis tree does not delay startup
   if os.path.exists(debug_dir):
-    shutil.rmtree(debug_dir)
-    logging.info(f"Cleared existing output directory: {debug_dir}")
+    stale_dir = f"{debug_dir.rstrip(os.sep)}.old-{datetime.now():%Y%m%d_%H%M%S_%f}"
+    os.rename(debug_dir, stale_dir)
+    threading.Thread(target=shutil.rmtree, args=(stale_dir,), kwargs={'ignore_errors': True}).start()
+    logging.info(f"Cleared existing output directory: {debug_dir} (removing {stale_dir} in background)")
   os.makedirs(f'{debug_dir}/track_vis', exist_ok=True)
   os.makedirs(f'{debug_dir}/ob_in_cam', exist_ok=True)
   logging.info(f"Created output directory structure: {debug_dir}")
 
   to_origin, extents = trimesh.bounds.oriented_bounds(mesh)
   bbox = np.stack([-extents/2, extents/2], axis=0).reshape(2,3)
+  to_origin_inv = np.linalg.inv(to_origin)
 
   scorer = ScorePredictor()
   refiner = PoseRefinePredictor()
@@ -206,12 +230,17 @@ if __name__=='__main__':
 
   reader = YcbineoatReader(video_dir=test_scene_dir, shorter_side=None, zfar=np.inf, rgb_only=args.rgb_only)
 
+  # PNG encoding of track_vis frames runs in the background, overlapping with tracking
+  vis_writer = ThreadPoolExecutor(max_workers=2)
+  vis_writes = []
+  max_vis_in_flight = 4   # each queued write holds a full frame, so bound the backlog
+  poses_out = np.empty((len(reader.color_files),4,4), dtype=np.float64)
   for i in range(len(reader.color_files)):
     logging.info(f'i:{i}')
     color = reader.get_color(i)
     depth = reader.get_depth(i)
     if i==0:
-      mask = reader.get_mask(0).astype(bool)
+      mask = reader.get_mask(0)
       pose = est.register(K=reader.K, rgb=color, depth=depth, ob_mask=mask, iteration=args.est_refine_iter)
 
       if debug>=3:
@@ -225,18 +254,36 @@ if __name__=='__main__':
     else:
       pose = est.track_one(rgb=color, depth=depth, K=reader.K, iteration=args.track_refine_iter)
 
-    os.makedirs(f'{debug_dir}/ob_in_cam', exist_ok=True)
-    np.savetxt(f'{debug_dir}/ob_in_cam/{reader.id_strs[i]}.txt', pose.reshape(4,4))
+    poses_out[i] = pose
+    # Per-frame text kept for compatibility; 8 significant digits instead of the default %.18e
+    np.savetxt(f'{debug_dir}/ob_in_cam/{reader.id_strs[i]}.txt', pose, fmt='%.8g')
 
-    if debug>=1:
-      center_pose = pose@np.linalg.inv(to_origin)
+    # Only render the overlay when it is displayed or saved
+    if args.show or debug>=2:
+      center_pose = pose@to_origin_inv
       vis = draw_posed_3d_box(reader.K, img=color, ob_in_cam=center_pose, bbox=bbox)
       vis = draw_xyz_axis(color, ob_in_cam=center_pose, scale=0.1, K=reader.K, thickness=3, transparency=0, is_input_rgb=True)
-      cv2.imshow('1', vis[...,::-1])
-      cv2.waitKey(1)
+      if args.show:
+        cv2.imshow('1', vis[...,::-1])
+        cv2.waitKey(1)
 
 
     if debug>=2:
-      os.makedirs(f'{debug_dir}/track_vis', exist_ok=True)
-      imageio.imwrite(f'{debug_dir}/track_vis/{reader.id_strs[i]}.png', vis)
+      if len(vis_writes) >= max_vis_in_flight:
+        wait([vis_writes[-max_vis_in_flight][1]])
+      vis_file = f'{debug_dir}/track_vis/{reader.id_strs[i]}.png'
+      vis_writes.append((vis_file, vis_writer.submit(cv2.imwrite, vis_file, vis[...,::-1])))
+
+  vis_writer.shutdown(wait=True)
+
+  # All poses as one (N,4,4) array, in the same order as ob_in_cam_ids.json
+  np.save(f'{debug_dir}/ob_in_cam.npy', poses_out)
+  with open(f'{debug_dir}/ob_in_cam_ids.json', 'w') as ff:
+    json.dump(reader.id_strs, ff)
 
+  # cv2.imwrite reports failure (e.g. a full disk) by returning False rather than raising
+  failed_writes = [vis_file for vis_file, write in vis_writes if not write.result()]
+  for vis_file in failed_writes:
+    logging.error(f"Failed to write {vis_file}")
+  if failed_writes:
+    raise IOError(f"{len(failed_writes)} track_vis image(s) could not be written")
@@ -47,8 +47,9 @@ def test_data_reader_rgb_only():
             depth_rgb_only = reader_rgb_only.get_depth(0)
             
             # Verify depth is all zeros
-            assert np.allclose(depth_rgb_only, 0), f"Expected zero depth map, got max value: {depth_rgb_only.max()}"
+            assert not depth_rgb_only.any(), f"Expected zero depth map, got max value: {depth_rgb_only.max()}"
             assert depth_rgb_only.shape == (480, 640), f"Expected shape (480, 640), got {depth_rgb_only.shape}"
+            assert not depth_rgb_only.flags.writeable, "Shared zero-depth map should be read-only"
             print("  ✓ RGB-only mode returns zero-depth maps")
             
             # Test normal mode (should try to load depth, but will fail gracefully)
@@ -164,8 +165,9 @@ def test_depth_filtering_skip():
         with open('estimater.py', 'r') as f:
             content = f.read()
         
-        # Check that depth filtering is conditionally skipped
-        assert 'if not self.rgb_only_mode:' in content, "Depth filtering skip logic not found"
+        # Check that depth filtering is skipped via the mode-specific preprocess binding
+        assert 'self._preprocess_depth = self._skip_depth_filtering' in content, "Depth filtering skip logic not found"
+        assert 'depth = self._preprocess_depth(depth)' in content, "Depth preprocessing call not found"
         assert 'erode_depth' in content, "erode_depth should be present"
         assert 'bilateral_filter_depth' in content, "bilateral_filter_depth should be present"
         print("  ✓ Depth filtering skip logic present")
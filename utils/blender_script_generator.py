@@ -14,63 +14,170 @@ This should now create animations that look exactly like the original video.
 """
 
 import numpy as np
+import io
 import os
+import re
 import glob
 import argparse
 from pathlib import Path
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
-def extract_pose_data(pose_dir):
-    """Extract all pose data from ob_in_cam directory"""
+# Trailing frame number of a pose filename stem: garnier_00170 -> 00170, 000000 -> 000000
+_FRAME_RE = re.compile(r'^(?:.*_)?(\d+)$')
+
+# Directory names recognized as object names by auto_detect_object_name
+_KNOWN_OBJECT_NAMES = frozenset({'garnier', 'bottle', 'mustard', 'hand', 'object', 'maybellene'})
+
+# OpenCV camera axes (+Y down, +Z forward) to Blender axes (+Y forward, +Z up)
+_CV_TO_BLENDER = np.array([
+    [1,  0,  0,  0],  # X stays the same
+    [0,  0,  1,  0],  # Y_blender = Z_opencv
+    [0, -1,  0,  0],  # Z_blender = -Y_opencv
+    [0,  0,  0,  1]
+], dtype=np.float64)
+
+# One entry of the embedded POSE_DATA list: frame number and nested 4x4 matrix
+_POSE_ENTRY_FMT = '    (%d, [\n' + '        [%.6f, %.6f, %.6f, %.6f],\n' * 4 + '    ]),\n'
+
+# Binary cache of parsed poses, written into the pose directory by extract_pose_data
+_POSE_CACHE_NAME = '.pose_cache.npz'
+
+def read_bytes(path):
+    """Read a whole file as bytes"""
+    with open(path, 'rb') as f:
+        return f.read()
+
+def parse_pose_blobs(blobs, names):
+    """Parse raw pose file contents into an (N,4,4) array with a single NumPy call
+    
+    Returns the stacked poses and the indices of the blobs they came from. Files
+    that do not hold exactly 16 values are reported and skipped before anything
+    is reshaped, so one malformed file cannot shift the poses of the others. Only
+    if the combined parse fails (a non-numeric value) are the files parsed one by
+    one, so that the bad ones can be reported and skipped.
+    """
+    tokens = []
+    keep = []
+    for i, (blob, name) in enumerate(zip(blobs, names)):
+        values = blob.split()
+        if len(values) != 16:
+            print(f"⚠️  Error loading {name}: expected 16 values, got {len(values)}")
+            continue
+        tokens.append(values)
+        keep.append(i)
+    
+    try:
+        return np.array(tokens, dtype=np.float64).reshape(-1, 4, 4), keep
+    except ValueError:
+        pass
+    
+    poses = []
+    parsed = []
+    for i, values in zip(keep, tokens):
+        try:
+            poses.append(np.array(values, dtype=np.float64).reshape(4, 4))
+        except ValueError as e:
+            print(f"⚠️  Error loading {names[i]}: {e}")
+            continue
+        parsed.append(i)
+    return np.asarray(poses).reshape(-1, 4, 4), parsed
+
+def pose_files_signature(pose_files):
+    """Cheap fingerprint of the pose files: count, total size and newest mtime"""
+    stats = [os.stat(p) for p in pose_files]
+    return np.array([len(stats),
+                     sum(st.st_size for st in stats),
+                     max(st.st_mtime_ns for st in stats)], dtype=np.int64)
+
+def load_pose_cache(cache_path, names, signature):
+    """Return cached (frames, poses) if the cache matches the current pose files, else None"""
+    try:
+        with np.load(cache_path) as cache:
+            if np.array_equal(cache['signature'], signature) and cache['names'].tolist() == names:
+                return cache['frames'], cache['poses']
+    except (OSError, KeyError, ValueError):
+        pass
+    return None
+
+def save_pose_cache(cache_path, names, signature, frames, poses):
+    """Write parsed poses to cache_path atomically; failures only print a warning"""
+    tmp_path = cache_path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, names=np.array(names), signature=signature, frames=frames, poses=poses)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"⚠️  Could not write pose cache {cache_path}: {e}")
+
+def extract_pose_data(pose_dir, pose_files=None, use_cache=True):
+    """Extract all pose data from ob_in_cam directory
+    
+    pose_files may be passed in when the directory listing is already known.
+    Returns (frames, poses): int64 frame numbers of shape (N,) and the matching
+    (N,4,4) pose matrices, sorted by frame number.
+    
+    With use_cache, parsed poses are saved to a binary cache in pose_dir and
+    reused on later runs as long as the pose file names, sizes and mtimes match.
+    """
     
     print(f"🔍 Extracting pose data from: {pose_dir}")
     
     if not os.path.exists(pose_dir):
         raise FileNotFoundError(f"Directory not found: {pose_dir}")
     
-    pose_files = sorted(glob.glob(os.path.join(pose_dir, "*.txt")))
+    if pose_files is None:
+        pose_files = sorted(glob.glob(os.path.join(pose_dir, "*.txt")))
     
     if not pose_files:
         raise FileNotFoundError(f"No pose files found in {pose_dir}")
     
-    pose_data = []
-    
+    if use_cache:
+        cache_path = os.path.join(pose_dir, _POSE_CACHE_NAME)
+        names = [os.path.basename(p) for p in pose_files]
+        signature = pose_files_signature(pose_files)
+        cached = load_pose_cache(cache_path, names, signature)
+        if cached is not None:
+            frames, poses = cached
+            print(f"✅ Loaded {len(frames)} pose matrices from cache {cache_path}")
+            print(f"   Frame range: {frames[0]} to {frames[-1]}")
+            return frames, poses
+    
+    # Extract frame identifiers (handle different naming patterns)
+    # Pattern: garnier_00170.txt or 000000.txt
+    frame_numbers = []
+    frame_files = []
     for pose_file in pose_files:
-        # Extract frame identifier (handle different naming patterns)
-        filename = os.path.basename(pose_file).replace('.txt', '')
-        
-        # Try different frame number extraction patterns
-        if '_' in filename:
-            # Pattern: garnier_00170.txt
-            frame_str = filename.split('_')[-1]
-        else:
-            # Pattern: 000000.txt
-            frame_str = filename
-        
-        try:
-            frame_number = int(frame_str)
-        except ValueError:
+        filename = os.path.basename(pose_file)[:-len('.txt')]
+        match = _FRAME_RE.match(filename)
+        if match is None:
             print(f"⚠️  Could not extract frame number from {filename}, skipping")
             continue
-        
-        # Load pose matrix
-        try:
-            pose_matrix = np.loadtxt(pose_file).reshape(4, 4)
-            pose_data.append((frame_number, pose_matrix))
-        except Exception as e:
-            print(f"⚠️  Error loading {pose_file}: {e}")
-            continue
+        frame_numbers.append(int(match.group(1)))
+        frame_files.append(pose_file)
+    
+    # Read every file as raw bytes (concurrently, since tiny-file reads are
+    # syscall-latency bound and release the GIL) and parse all pose matrices in one pass
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+        blobs = list(executor.map(read_bytes, frame_files))
+    poses, keep = parse_pose_blobs(blobs, frame_files)
+    frames = np.asarray(frame_numbers, dtype=np.int64)[keep]
     
-    if not pose_data:
+    if len(frames) == 0:
         raise ValueError("No valid pose matrices found")
     
     # Sort by frame number
-    pose_data.sort(key=lambda x: x[0])
+    order = np.argsort(frames, kind='stable')
+    frames = frames[order]
+    poses = poses[order]
     
-    print(f"✅ Extracted {len(pose_data)} pose matrices")
-    print(f"   Frame range: {pose_data[0][0]} to {pose_data[-1][0]}")
+    if use_cache:
+        save_pose_cache(cache_path, names, signature, frames, poses)
     
-    return pose_data
+    print(f"✅ Extracted {len(frames)} pose matrices")
+    print(f"   Frame range: {frames[0]} to {frames[-1]}")
+    
+    return frames, poses
 
 def load_camera_intrinsics(cam_K_file):
     """Load camera intrinsics matrix"""
@@ -80,7 +187,8 @@ def load_camera_intrinsics(cam_K_file):
         return None
     
     try:
-        K = np.loadtxt(cam_K_file)
+        with open(cam_K_file, 'rb') as f:
+            K = np.array(f.read().split(), dtype=np.float64).reshape(3, 3)
         print(f"✅ Loaded camera intrinsics:")
         print(f"   Focal length: fx={K[0,0]:.1f}, fy={K[1,1]:.1f}")
         print(f"   Principal point: cx={K[0,2]:.1f}, cy={K[1,2]:.1f}")
@@ -90,35 +198,31 @@ def load_camera_intrinsics(cam_K_file):
         print(f"⚠️  Error loading camera intrinsics: {e}")
         return None
 
-def format_pose_data_for_python(pose_data):
-    """Convert pose data to Python code representation"""
-    
-    lines = ["# Pose data extracted from FoundationPose ob_in_cam", "POSE_DATA = ["]
+def write_pose_data(fp, frames, poses, chunk_size=1024):
+    """Write pose data as Python code to fp, one chunk of poses at a time"""
     
-    for frame_num, pose_matrix in pose_data:
-        # Format pose matrix as nested list
-        lines.append(f"    ({frame_num}, [")
-        for row in pose_matrix:
-            row_str = "        [" + ", ".join(f"{val:.6f}" for val in row) + "],"
-            lines.append(row_str)
-        lines.append("    ]),")
+    fp.write("# Pose data extracted from FoundationPose ob_in_cam (converted to Blender coordinates)\nPOSE_DATA = [\n")
     
-    lines.append("]")
-    lines.append("")
+    for start in range(0, len(frames), chunk_size):
+        # Format each pose entry (frame number + nested 4x4 list) with a single % operation
+        chunk = zip(frames[start:start + chunk_size].tolist(),
+                    poses[start:start + chunk_size].reshape(-1, 16).tolist())
+        fp.write(''.join(_POSE_ENTRY_FMT % (frame_num, *pose) for frame_num, pose in chunk))
     
-    return "\n".join(lines)
+    fp.write("]\n")
 
-def auto_detect_object_name(pose_dir):
+def auto_detect_object_name(pose_dir, pose_files=None):
     """Auto-detect object name from directory path or pose filenames"""
     
     # Try to extract from directory path
     parts = Path(pose_dir).parts
     for part in reversed(parts):
-        if part in ['garnier', 'bottle', 'mustard', 'hand', 'object', 'maybellene']:
+        if part in _KNOWN_OBJECT_NAMES:
             return part
     
-    # Try to extract from pose filenames
-    pose_files = glob.glob(os.path.join(pose_dir, "*.txt"))
+    # Try to extract from pose filenames (reusing the listing if the caller has one)
+    if pose_files is None:
+        pose_files = glob.glob(os.path.join(pose_dir, "*.txt"))
     if pose_files:
         filename = os.path.basename(pose_files[0])
         if '_' in filename:
@@ -128,24 +232,20 @@ def auto_detect_object_name(pose_dir):
     
     return "tracked_object"
 
-def filter_reliable_poses(pose_data):
+def filter_reliable_poses(frames, poses):
     """Filter pose data to remove unreliable tracking (large jumps or outliers)"""
     
-    if len(pose_data) < 10:
-        return pose_data
+    if len(frames) < 10:
+        return frames, poses
     
-    print(f"🔍 Filtering {len(pose_data)} poses for reliability...")
+    print(f"🔍 Filtering {len(frames)} poses for reliability...")
     
     # Calculate distances from origin
-    distances = []
-    for frame_num, pose_matrix in pose_data:
-        distance = np.linalg.norm(pose_matrix[:3, 3])
-        distances.append((frame_num, pose_matrix, distance))
+    distances = np.linalg.norm(poses[:, :3, 3], axis=1)
     
     # Calculate statistics
-    distance_values = [d[2] for d in distances]
-    mean_distance = np.mean(distance_values)
-    std_distance = np.std(distance_values)
+    mean_distance = distances.mean()
+    std_distance = distances.std()
     
     # Use lenient filtering - only remove extreme outliers that are clearly tracking failures
     max_reasonable_distance = mean_distance + 3 * std_distance  # Very lenient
@@ -153,34 +253,43 @@ def filter_reliable_poses(pose_data):
     
     print(f"   📊 Using lenient filtering: allowing {min_reasonable_distance:.2f}m - {max_reasonable_distance:.2f}m")
     
-    # Only detect very sudden large jumps (tracking completely lost)
-    filtered_poses = []
-    prev_distance = None
-    
-    for i, (frame_num, pose_matrix, distance) in enumerate(distances):
-        # Only filter extreme outliers that are clearly impossible
-        if distance > max_reasonable_distance or distance < min_reasonable_distance:
-            print(f"   ⚠️  Filtering frame {frame_num}: distance {distance:.2f}m (outside {min_reasonable_distance:.2f}-{max_reasonable_distance:.2f}m)")
-            continue
-            
-        # Only detect massive jumps that indicate complete tracking loss (>10m jump)
-        if prev_distance is not None and abs(distance - prev_distance) > 10.0:
-            print(f"   ⚠️  Filtering frame {frame_num}: massive jump from {prev_distance:.2f}m to {distance:.2f}m")
-            continue
-            
-        filtered_poses.append((frame_num, pose_matrix))
-        prev_distance = distance
+    # Only filter extreme outliers that are clearly impossible
+    in_range = (distances >= min_reasonable_distance) & (distances <= max_reasonable_distance)
+    keep = in_range.copy()
+    
+    # Only detect massive jumps that indicate complete tracking loss (>10m jump).
+    # A rejected frame must not become the reference for the next one, so the
+    # sequential walk is only needed when the vectorized check finds a jump.
+    jump_from = {}
+    candidates = np.flatnonzero(in_range)
+    if np.any(np.abs(np.diff(distances[candidates])) > 10.0):
+        prev_distance = None
+        for i in candidates:
+            if prev_distance is not None and abs(distances[i] - prev_distance) > 10.0:
+                keep[i] = False
+                jump_from[i] = prev_distance
+                continue
+            prev_distance = distances[i]
+    
+    for i in np.flatnonzero(~keep):
+        if not in_range[i]:
+            print(f"   ⚠️  Filtering frame {frames[i]}: distance {distances[i]:.2f}m (outside {min_reasonable_distance:.2f}-{max_reasonable_distance:.2f}m)")
+        else:
+            print(f"   ⚠️  Filtering frame {frames[i]}: massive jump from {jump_from[i]:.2f}m to {distances[i]:.2f}m")
     
-    print(f"✅ Kept {len(filtered_poses)}/{len(pose_data)} reliable poses")
-    print(f"   Distance range: {min([np.linalg.norm(p[1][:3, 3]) for p in filtered_poses]):.2f}m - {max([np.linalg.norm(p[1][:3, 3]) for p in filtered_poses]):.2f}m")
+    kept = distances[keep]
+    print(f"✅ Kept {len(kept)}/{len(frames)} reliable poses")
+    print(f"   Distance range: {kept.min():.2f}m - {kept.max():.2f}m")
     
-    return filtered_poses
+    return frames[keep], poses[keep]
 
-def calculate_scene_bounds(pose_data):
+def calculate_scene_bounds(poses):
     """Calculate scene bounds and optimal visualization settings"""
     
-    positions = np.array([pose[1][:3, 3] for pose in pose_data])
-    distances = np.array([np.linalg.norm(pos) for pos in positions])
+    positions = poses[:, :3, 3]
+    distances = np.linalg.norm(positions, axis=1)
+    min_xyz = positions.min(axis=0)
+    max_xyz = positions.max(axis=0)
     
     stats = {
         'positions': positions,
@@ -189,12 +298,12 @@ def calculate_scene_bounds(pose_data):
         'max_distance': distances.max(),
         'mean_distance': distances.mean(),
         'position_bounds': {
-            'x_min': positions[:, 0].min(),
-            'x_max': positions[:, 0].max(),
-            'y_min': positions[:, 1].min(), 
-            'y_max': positions[:, 1].max(),
-            'z_min': positions[:, 2].min(),
-            'z_max': positions[:, 2].max()
+            'x_min': min_xyz[0],
+            'x_max': max_xyz[0],
+            'y_min': min_xyz[1], 
+            'y_max': max_xyz[1],
+            'z_min': min_xyz[2],
+            'z_max': max_xyz[2]
         }
     }
     
@@ -219,58 +328,17 @@ def calculate_scene_bounds(pose_data):
     
     return stats
 
-def generate_blender_script_template(pose_data, object_name, source_info, camera_K=None):
-    """Generate the complete Blender script with embedded data and FIXED camera positioning"""
-    
-    # Filter unreliable poses first
-    filtered_pose_data = filter_reliable_poses(pose_data)
-    
-    # Calculate scene bounds and optimal settings
-    scene_stats = calculate_scene_bounds(filtered_pose_data)
-    vis_settings = scene_stats['visualization']
-    
-    # Generate pose data as Python code (using filtered data)
-    pose_data_code = format_pose_data_for_python(filtered_pose_data)
-    
-    # Camera intrinsics code
-    if camera_K is not None:
-        camera_code = f"""
-# Camera intrinsics from FoundationPose data
-CAMERA_K = np.array([
-    [{camera_K[0,0]:.6f}, {camera_K[0,1]:.6f}, {camera_K[0,2]:.6f}],
-    [{camera_K[1,0]:.6f}, {camera_K[1,1]:.6f}, {camera_K[1,2]:.6f}],
-    [{camera_K[2,0]:.6f}, {camera_K[2,1]:.6f}, {camera_K[2,2]:.6f}]
-])
-
-# Camera parameters
-FOCAL_LENGTH_MM = {camera_K[0,0]:.1f}  # Focal length in pixels
-SENSOR_WIDTH_MM = 36.0  # Standard sensor width
-IMAGE_WIDTH_PX = {camera_K[0,2]*2:.0f}
-IMAGE_HEIGHT_PX = {camera_K[1,2]*2:.0f}
-
-# Calculate focal length in mm for Blender
-FOCAL_LENGTH_BLENDER_MM = (FOCAL_LENGTH_MM * SENSOR_WIDTH_MM) / IMAGE_WIDTH_PX
-"""
-    else:
-        camera_code = """
-# Default camera parameters (no intrinsics file found)
-CAMERA_K = None
-FOCAL_LENGTH_BLENDER_MM = 35.0  # Default focal length
-SENSOR_WIDTH_MM = 36.0
-IMAGE_WIDTH_PX = 640
-IMAGE_HEIGHT_PX = 480
-"""
-    
-    script_template = f'''#!/usr/bin/env python3
+# Generated script templates, filled in with str.format_map by write_blender_script
+_SCRIPT_PROLOGUE = '''#!/usr/bin/env python3
 """
 Standalone FoundationPose Blender Animation Script - FIXED VERSION
 ================================================================
 FIXED: Camera positioning to properly replicate original video viewpoint
 
-Generated on: {datetime.now().isoformat()}
+Generated on: {now_iso}
 Source: {source_info}
 Object: {object_name}
-Frames: {len(filtered_pose_data)} total ({filtered_pose_data[0][0]} to {filtered_pose_data[-1][0]}) - filtered from {len(pose_data)} original
+Frames: {n_filtered} total ({first_frame} to {last_frame}) - filtered from {n_original} original
 
 KEY FIXES:
 1. Camera positioned at origin (ob_in_cam coordinates)
@@ -295,7 +363,14 @@ from mathutils import Matrix, Vector, Euler
 # EMBEDDED POSE DATA
 # ============================
 
-{pose_data_code}
+'''
+
+_SCRIPT_EPILOGUE = '''
+# Pose data as arrays, converted once and shared by all functions below
+POSE_FRAMES = np.array([frame for frame, _ in POSE_DATA], dtype=np.int64)
+POSE_MATRICES = np.array([matrix for _, matrix in POSE_DATA], dtype=np.float64)
+DISTANCES = np.linalg.norm(POSE_MATRICES[:, :3, 3], axis=1)
+NUM_FRAMES = len(POSE_FRAMES)
 
 # ============================
 # CAMERA INTRINSICS
@@ -312,8 +387,8 @@ FRAME_RATE = 30
 ANIMATION_SPEED = 1.0
 
 # Auto-configured visualization settings
-OBJECT_SIZE = {vis_settings['object_size']:.3f}
-COORD_SIZE = {vis_settings['coord_size']:.3f}
+OBJECT_SIZE = {object_size:.3f}
+COORD_SIZE = {coord_size:.3f}
 
 # Features
 MOTION_TRAIL = True
@@ -323,17 +398,17 @@ OBJECT_REPRESENTATION = True
 
 # Source information (for reference)
 SOURCE_INFO = {{
-    'generated_on': '{datetime.now().isoformat()}',
+    'generated_on': '{now_iso}',
     'source_data': '{source_info}',
     'object_name': '{object_name}',
-    'total_frames': {len(filtered_pose_data)},
-    'original_frames': {len(pose_data)},
-    'frame_range': '{filtered_pose_data[0][0]}-{filtered_pose_data[-1][0]}',
-    'distance_range': '{scene_stats['min_distance']:.2f}m - {scene_stats['max_distance']:.2f}m',
+    'total_frames': {n_filtered},
+    'original_frames': {n_original},
+    'frame_range': '{first_frame}-{last_frame}',
+    'distance_range': '{min_distance:.2f}m - {max_distance:.2f}m',
     'motion_bounds': {{
-        'x_range': '[{scene_stats['position_bounds']['x_min']:.2f}, {scene_stats['position_bounds']['x_max']:.2f}]m',
-        'y_range': '[{scene_stats['position_bounds']['y_min']:.2f}, {scene_stats['position_bounds']['y_max']:.2f}]m',
-        'z_range': '[{scene_stats['position_bounds']['z_min']:.2f}, {scene_stats['position_bounds']['z_max']:.2f}]m'
+        'x_range': '[{x_min:.2f}, {x_max:.2f}]m',
+        'y_range': '[{y_min:.2f}, {y_max:.2f}]m',
+        'z_range': '[{z_min:.2f}, {z_max:.2f}]m'
     }}
 }}
 
@@ -341,23 +416,34 @@ SOURCE_INFO = {{
 # COORDINATE SYSTEM CONVERSION
 # ============================
 
-def convert_cv_to_blender(cv_matrix):
+# POSE_DATA is converted from OpenCV camera coordinates (+X right, +Y down, +Z forward)
+# to Blender coordinates (+X right, +Y forward, +Z up) when this script is generated,
+# so ob_in_cam matrices can be used directly as Blender object transforms.
+
+def matrices_to_euler_xyz(rotations):
     """
-    Convert OpenCV camera coordinates to Blender coordinates
+    Vectorized Matrix.to_euler('XYZ') for an (N,3,3) array of rotation matrices
     
-    OpenCV: +X right, +Y down, +Z forward (into scene)
-    Blender: +X right, +Y forward, +Z up
-    
-    FIXED: This properly converts ob_in_cam coordinates to Blender space
+    Follows Blender: of the two equivalent solutions the one with the smaller
+    total angle is used, and Z is zeroed at gimbal lock.
     """
-    cv_to_blender = Matrix([
-        [1,  0,  0,  0],  # X stays the same
-        [0,  0,  1,  0],  # Y_blender = Z_opencv  
-        [0, -1,  0,  0],  # Z_blender = -Y_opencv
-        [0,  0,  0,  1]
-    ])
-    
-    return cv_to_blender @ Matrix(cv_matrix)
+    R = rotations / np.linalg.norm(rotations, axis=1, keepdims=True)
+    cy = np.hypot(R[:, 0, 0], R[:, 1, 0])
+    eul1 = np.stack([np.arctan2(R[:, 2, 1], R[:, 2, 2]),
+                     np.arctan2(-R[:, 2, 0], cy),
+                     np.arctan2(R[:, 1, 0], R[:, 0, 0])], axis=1)
+    eul2 = np.stack([np.arctan2(-R[:, 2, 1], -R[:, 2, 2]),
+                     np.arctan2(-R[:, 2, 0], -cy),
+                     np.arctan2(-R[:, 1, 0], -R[:, 0, 0])], axis=1)
+    
+    locked = cy <= 16 * np.finfo(np.float32).eps
+    if locked.any():
+        eul1[locked, 0] = np.arctan2(-R[locked, 1, 2], R[locked, 1, 1])
+        eul1[locked, 2] = 0.0
+        eul2[locked] = eul1[locked]
+    
+    use_eul2 = np.abs(eul1).sum(axis=1) > np.abs(eul2).sum(axis=1)
+    return np.where(use_eul2[:, None], eul2, eul1)
 
 def extract_transform_components(pose_matrix):
     """Extract location, rotation, and scale from 4x4 transformation matrix"""
@@ -371,8 +457,8 @@ def extract_transform_components(pose_matrix):
 
 def clear_scene():
     """Clear all objects from the Blender scene"""
-    bpy.ops.object.select_all(action='SELECT')
-    bpy.ops.object.delete(use_global=False)
+    for obj in list(bpy.context.scene.objects):
+        bpy.data.objects.remove(obj, do_unlink=True)
     
     # Clear orphaned data
     for block in bpy.data.meshes:
@@ -383,6 +469,20 @@ def clear_scene():
         if block.users == 0:
             bpy.data.materials.remove(block)
 
+def add_object(name, data=None, location=(0, 0, 0)):
+    """Create an object from datablock and link it, without bpy.ops scene updates"""
+    obj = bpy.data.objects.new(name, data)
+    obj.location = location
+    bpy.context.collection.objects.link(obj)
+    return obj
+
+def add_empty(name, display_type, size):
+    """Create an empty object with the given display type and size"""
+    empty = add_object(name)
+    empty.empty_display_type = display_type
+    empty.empty_display_size = size
+    return empty
+
 def create_material(name, color=(1, 0, 0, 1)):
     """Create a material with specified color"""
     material = bpy.data.materials.new(name=name)
@@ -405,9 +505,7 @@ def create_fixed_camera():
     # FIXED: Camera at origin since ob_in_cam is object-in-camera coordinates
     camera_location = Vector((0, 0, 0))
     
-    bpy.ops.object.camera_add(location=camera_location)
-    camera = bpy.context.active_object
-    camera.name = "FixedCamera"
+    camera = add_object("FixedCamera", bpy.data.cameras.new("FixedCamera"), camera_location)
     
     # FIXED: Use actual focal length from camera intrinsics
     camera.data.lens = FOCAL_LENGTH_BLENDER_MM
@@ -434,15 +532,16 @@ def create_tracked_object():
     """Create animated object representing tracked target"""
     
     # Create main tracking object (empty for precise positioning)
-    bpy.ops.object.empty_add(type='ARROWS', radius=OBJECT_SIZE, location=(0, 0, 0))
-    tracked_object = bpy.context.active_object
-    tracked_object.name = f"{{OBJECT_NAME}}_TrackedObject"
+    tracked_object = add_empty(f"{{OBJECT_NAME}}_TrackedObject", 'ARROWS', OBJECT_SIZE)
     
     if OBJECT_REPRESENTATION:
         # Create visual representation with realistic proportions
-        bpy.ops.mesh.primitive_cube_add(size=OBJECT_SIZE, location=(0, 0, 0))
-        object_cube = bpy.context.active_object
-        object_cube.name = f"{{OBJECT_NAME}}_Representation"
+        cube_mesh = bpy.data.meshes.new(f"{{OBJECT_NAME}}_Representation")
+        bm = bmesh.new()
+        bmesh.ops.create_cube(bm, size=OBJECT_SIZE)
+        bm.to_mesh(cube_mesh)
+        bm.free()
+        object_cube = add_object(f"{{OBJECT_NAME}}_Representation", cube_mesh)
         
         # Apply realistic object proportions (adapt based on object type)
         if 'bottle' in OBJECT_NAME.lower() or 'mustard' in OBJECT_NAME.lower():
@@ -474,9 +573,7 @@ def create_coordinate_axes():
     if not COORDINATE_AXES:
         return
     
-    bpy.ops.object.empty_add(type='PLAIN_AXES', radius=COORD_SIZE, location=(0, 0, 0))
-    axes = bpy.context.active_object
-    axes.name = "CoordinateSystem"
+    axes = add_empty("CoordinateSystem", 'PLAIN_AXES', COORD_SIZE)
     
     print("✅ Created coordinate axes")
     return axes
@@ -487,15 +584,11 @@ def create_professional_lighting():
         return
     
     # Sun light for overall illumination
-    bpy.ops.object.light_add(type='SUN', location=(5, 5, 10))
-    sun_light = bpy.context.active_object
-    sun_light.name = "SunLight"
+    sun_light = add_object("SunLight", bpy.data.lights.new("SunLight", type='SUN'), (5, 5, 10))
     sun_light.data.energy = 3.0
     
     # Area light for ambient lighting
-    bpy.ops.object.light_add(type='AREA', location=(-2, -2, 3))
-    area_light = bpy.context.active_object
-    area_light.name = "AreaLight"
+    area_light = add_object("AreaLight", bpy.data.lights.new("AreaLight", type='AREA'), (-2, -2, 3))
     area_light.data.energy = 2.0
     area_light.data.size = 2.0
     
@@ -544,57 +637,69 @@ def create_animation_keyframes(tracked_object):
     
     # Set animation frame range
     frame_start = 1
-    frame_end = len(POSE_DATA)
+    frame_end = NUM_FRAMES
     
     bpy.context.scene.frame_start = frame_start
     bpy.context.scene.frame_end = frame_end
-    bpy.context.scene.frame_set(frame_start)
     
     print(f"🎬 Creating FIXED animation:")
-    print(f"   Source frames: {{POSE_DATA[0][0]}} to {{POSE_DATA[-1][0]}}")
+    print(f"   Source frames: {{POSE_FRAMES[0]}} to {{POSE_FRAMES[-1]}}")
     print(f"   Blender frames: {{frame_start}} to {{frame_end}}")
     print(f"   FIXED: Camera at origin, object moves as in ob_in_cam data")
     print(f"   This should now replicate the original video exactly!")
     
-    # Create keyframes using FIXED methodology
-    object_positions = []
+    # Extract transforms for all frames at once using FIXED methodology
+    # Poses are already in Blender coordinate system (converted by the generator)
+    # FIXED: Use ob_in_cam data directly (object position relative to camera)
+    object_positions = POSE_MATRICES[:, :3, 3].astype(np.float32)
+    object_rotations = matrices_to_euler_xyz(POSE_MATRICES[:, :3, :3]).astype(np.float32)
     
-    for i, (source_frame, pose_matrix) in enumerate(POSE_DATA):
+    # Progress feedback
+    for i in sorted(set(range(0, NUM_FRAMES, 50)) | {{NUM_FRAMES - 1}}):
         blender_frame = i + 1
+        object_location = Vector(POSE_MATRICES[i, :3, 3])
+        print(f"   Frame {{blender_frame:3d}}: Source {{POSE_FRAMES[i]}} | Pos {{object_location}} | Dist {{DISTANCES[i]:.2f}}m")
+    
+    # Insert all keyframes at once: one FCurve per channel, filled with foreach_set
+    # instead of a keyframe_insert (and scene update) per frame and channel
+    tracked_object.animation_data_create()
+    action = bpy.data.actions.new(f"{{OBJECT_NAME}}_Action")
+    tracked_object.animation_data.action = action
+    
+    if hasattr(action, "fcurves"):
+        # Legacy Action API (removed in Blender 5.0)
+        def new_fcurve(data_path, index):
+            return action.fcurves.new(data_path=data_path, index=index, action_group="Object Transforms")
+    else:
+        # Slotted actions (Blender 4.4+): F-Curves live in the channelbag of a keyframe strip
+        slot = action.slots.new(id_type='OBJECT', name=tracked_object.name)
+        tracked_object.animation_data.action_slot = slot
+        channelbag = action.layers.new("Layer").strips.new(type='KEYFRAME').channelbag(slot, ensure=True)
+        group = channelbag.groups.new("Object Transforms")
         
-        # Convert pose to Blender coordinate system
-        blender_matrix = convert_cv_to_blender(pose_matrix)
-        
-        # CRITICAL: Set frame BEFORE setting object transform
-        bpy.context.scene.frame_set(blender_frame)
-        
-        # FIXED: Use ob_in_cam data directly (object position relative to camera)
-        object_location = blender_matrix.translation
-        object_rotation = blender_matrix.to_euler('XYZ')
-        
-        # Set object transform
-        tracked_object.location = object_location
-        tracked_object.rotation_euler = object_rotation
-        
-        # Insert keyframes with explicit frame numbers
-        tracked_object.keyframe_insert(data_path="location", frame=blender_frame)
-        tracked_object.keyframe_insert(data_path="rotation_euler", frame=blender_frame)
-        
-        # Store position for path visualization
-        object_positions.append(object_location.copy())
-        
-        # Progress feedback
-        if i % 50 == 0 or i == len(POSE_DATA) - 1:
-            distance = np.linalg.norm(np.array(pose_matrix)[:3, 3])
-            print(f"   Frame {{blender_frame:3d}}: Source {{source_frame}} | Pos {{object_location}} | Dist {{distance:.2f}}m")
-    
-    # Set linear interpolation for smooth motion
-    if tracked_object.animation_data and tracked_object.animation_data.action:
-        for fcurve in tracked_object.animation_data.action.fcurves:
-            for keyframe in fcurve.keyframe_points:
-                keyframe.interpolation = 'LINEAR'
-    
-    print(f"✅ Created {{len(POSE_DATA)}} keyframes with linear interpolation")
+        def new_fcurve(data_path, index):
+            fcurve = channelbag.fcurves.new(data_path, index=index)
+            fcurve.group = group
+            return fcurve
+    
+    co = np.empty(2 * NUM_FRAMES, dtype=np.float32)
+    co[0::2] = np.arange(frame_start, frame_end + 1)
+    # Linear interpolation for smooth motion, set through foreach_set as the enum's integer value
+    linear = bpy.types.Keyframe.bl_rna.properties['interpolation'].enum_items['LINEAR'].value
+    interpolation = np.full(NUM_FRAMES, linear, dtype=np.int32)
+    for data_path, values in (("location", object_positions), ("rotation_euler", object_rotations)):
+        for axis in range(3):
+            fcurve = new_fcurve(data_path, axis)
+            fcurve.keyframe_points.add(NUM_FRAMES)
+            co[1::2] = values[:, axis]
+            fcurve.keyframe_points.foreach_set("co", co)
+            fcurve.keyframe_points.foreach_set("interpolation", interpolation)
+            fcurve.update()
+    
+    # Evaluate the scene once, after all keyframes exist
+    bpy.context.scene.frame_set(frame_start)
+    
+    print(f"✅ Created {{NUM_FRAMES}} keyframes with linear interpolation")
     return object_positions
 
 def create_motion_path_visualization(object_positions):
@@ -642,8 +747,8 @@ def create_foundationpose_animation():
     print("=" * 60)
     print(f"📊 Data Summary:")
     print(f"   Object: {{OBJECT_NAME}}")
-    print(f"   Frames: {{len(POSE_DATA)}} total")
-    print(f"   Range: {{POSE_DATA[0][0]}} to {{POSE_DATA[-1][0]}}")
+    print(f"   Frames: {{NUM_FRAMES}} total")
+    print(f"   Range: {{POSE_FRAMES[0]}} to {{POSE_FRAMES[-1]}}")
     print(f"   Distance: {{SOURCE_INFO['distance_range']}}")
     print(f"   FIXED: Camera at origin, proper focal length")
     print("=" * 60)
@@ -675,7 +780,6 @@ def create_foundationpose_animation():
         # 6. Final setup
         print("6️⃣ Final configuration...")
         bpy.context.scene.camera = camera
-        bpy.context.scene.frame_set(1)
         
         # Set viewport shading
         for area in bpy.context.screen.areas:
@@ -686,21 +790,20 @@ def create_foundationpose_animation():
                         break
         
         # Add scene info text to show animation details in viewport
-        bpy.ops.object.text_add(location=(0, 0, 2))
-        text_obj = bpy.context.active_object
-        text_obj.name = "FoundationPose_SceneInfo"
-        text_obj.data.body = f"FoundationPose Animation - FIXED\\n{{OBJECT_NAME}}\\nFrames: {{len(POSE_DATA)}}\\nCamera: Origin + {{FOCAL_LENGTH_BLENDER_MM:.1f}}mm"
+        text_curve = bpy.data.curves.new("FoundationPose_SceneInfo", type='FONT')
+        text_obj = add_object("FoundationPose_SceneInfo", text_curve, (0, 0, 2))
+        text_obj.data.body = f"FoundationPose Animation - FIXED\\n{{OBJECT_NAME}}\\nFrames: {{NUM_FRAMES}}\\nCamera: Origin + {{FOCAL_LENGTH_BLENDER_MM:.1f}}mm"
         
         # Make the text well-sized and positioned for viewport visibility  
         text_obj.scale = (0.5, 0.5, 0.5)  # Good readable size
-        print(f"📝 Scene info text created showing: FoundationPose Animation - FIXED | {{OBJECT_NAME}} | {{len(POSE_DATA)}} frames")
+        print(f"📝 Scene info text created showing: FoundationPose Animation - FIXED | {{OBJECT_NAME}} | {{NUM_FRAMES}} frames")
         
         print("=" * 60)
         print("🎉 FoundationPose Animation Created Successfully - FIXED VERSION!")
         print(f"📊 Scene Summary:")
         print(f"   📹 Camera: {{camera.name}} (FIXED: at origin with proper focal length)")
         print(f"   🎯 Tracked object: {{tracked_object.name}}")
-        print(f"   🎬 Animation: {{len(POSE_DATA)}} frames at {{FRAME_RATE}} FPS")
+        print(f"   🎬 Animation: {{NUM_FRAMES}} frames at {{FRAME_RATE}} FPS")
         print(f"   📏 Motion range: {{SOURCE_INFO['distance_range']}}")
         print(f"   🛤️  Motion path: Red curve showing 3D trajectory")
         print(f"   🎥 FIXED: Should now look exactly like the original video!")
@@ -738,8 +841,87 @@ if __name__ == "__main__":
         print("3. Load and run this script")
         print("4. Switch to Animation workspace and press SPACE")
 '''
+
+def generate_blender_script_template(frames, poses, object_name, source_info, camera_K=None):
+    """Generate the complete Blender script as a string (see write_blender_script)"""
+    
+    buf = io.StringIO()
+    write_blender_script(buf, frames, poses, object_name, source_info, camera_K)
+    return buf.getvalue()
+
+def write_blender_script(fp, frames, poses, object_name, source_info, camera_K=None):
+    """Write the complete Blender script with embedded data and FIXED camera positioning to fp
+    
+    The script is streamed: prologue, pose data and epilogue are written in turn,
+    so the embedded pose table is never held in memory as one string.
+    Returns the filtered frames, poses and their scene statistics.
+    """
+    
+    # Filter unreliable poses first
+    filtered_frames, filtered_poses = filter_reliable_poses(frames, poses)
+    
+    # Calculate scene bounds and optimal settings
+    scene_stats = calculate_scene_bounds(filtered_poses)
+    vis_settings = scene_stats['visualization']
+    
+    # Convert all poses to Blender coordinates in one batched matmul, so the
+    # generated script does not build and multiply a Matrix per frame
+    blender_poses = _CV_TO_BLENDER @ filtered_poses
+    
+    # Camera intrinsics code
+    if camera_K is not None:
+        camera_code = f"""
+# Camera intrinsics from FoundationPose data
+CAMERA_K = np.array([
+    [{camera_K[0,0]:.6f}, {camera_K[0,1]:.6f}, {camera_K[0,2]:.6f}],
+    [{camera_K[1,0]:.6f}, {camera_K[1,1]:.6f}, {camera_K[1,2]:.6f}],
+    [{camera_K[2,0]:.6f}, {camera_K[2,1]:.6f}, {camera_K[2,2]:.6f}]
+])
+
+# Camera parameters
+FOCAL_LENGTH_MM = {camera_K[0,0]:.1f}  # Focal length in pixels
+SENSOR_WIDTH_MM = 36.0  # Standard sensor width
+IMAGE_WIDTH_PX = {camera_K[0,2]*2:.0f}
+IMAGE_HEIGHT_PX = {camera_K[1,2]*2:.0f}
+
+# Calculate focal length in mm for Blender
+FOCAL_LENGTH_BLENDER_MM = (FOCAL_LENGTH_MM * SENSOR_WIDTH_MM) / IMAGE_WIDTH_PX
+"""
+    else:
+        camera_code = """
+# Default camera parameters (no intrinsics file found)
+CAMERA_K = None
+FOCAL_LENGTH_BLENDER_MM = 35.0  # Default focal length
+SENSOR_WIDTH_MM = 36.0
+IMAGE_WIDTH_PX = 640
+IMAGE_HEIGHT_PX = 480
+"""
     
-    return script_template
+    # Fields shared by the prologue and epilogue templates, computed once
+    fields = {
+        'now_iso': datetime.now().isoformat(),
+        'source_info': source_info,
+        'object_name': object_name,
+        'n_filtered': len(filtered_frames),
+        'n_original': len(frames),
+        'first_frame': filtered_frames[0],
+        'last_frame': filtered_frames[-1],
+        'camera_code': camera_code,
+        'object_size': vis_settings['object_size'],
+        'coord_size': vis_settings['coord_size'],
+        'min_distance': scene_stats['min_distance'],
+        'max_distance': scene_stats['max_distance'],
+        **scene_stats['position_bounds'],
+    }
+    
+    fp.write(_SCRIPT_PROLOGUE.format_map(fields))
+    
+    # Generate pose data as Python code (using filtered data)
+    write_pose_data(fp, filtered_frames, blender_poses)
+    
+    fp.write(_SCRIPT_EPILOGUE.format_map(fields))
+    
+    return filtered_frames, filtered_poses, scene_stats
 
 def main():
     parser = argparse.ArgumentParser(description='Generate FIXED standalone Blender script with proper camera positioning')
@@ -751,6 +933,8 @@ def main():
                        help='Output filename for Blender script (default: auto-generated)')
     parser.add_argument('--camera_intrinsics', type=str, default=None,
                        help='Path to camera intrinsics file (cam_K.txt)')
+    parser.add_argument('--no_cache', action='store_true',
+                       help=f'Always parse pose .txt files; do not read or write {_POSE_CACHE_NAME} in the input directory')
     
     args = parser.parse_args()
     
@@ -763,8 +947,9 @@ def main():
     print("=" * 60)
     
     # Extract pose data
+    pose_files = sorted(glob.glob(os.path.join(args.input, "*.txt")))
     try:
-        pose_data = extract_pose_data(args.input)
+        frames, poses = extract_pose_data(args.input, pose_files, use_cache=not args.no_cache)
     except Exception as e:
         print(f"❌ Error extracting pose data: {e}")
         return
@@ -789,7 +974,7 @@ def main():
     
     # Auto-detect object name if not provided
     if args.object_name is None:
-        args.object_name = auto_detect_object_name(args.input)
+        args.object_name = auto_detect_object_name(args.input, pose_files)
     
     print(f"🎯 Object name: {args.object_name}")
     
@@ -798,35 +983,30 @@ def main():
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         args.output = f"blender_{args.object_name}_animation_FIXED_{timestamp}.py"
     
-    # Calculate scene statistics for summary
-    scene_stats = calculate_scene_bounds(pose_data)
-    
     # Generate script (filtering will happen inside the template function)
     print(f"📝 Generating FIXED Blender script...")
-    original_count = len(pose_data)
-    script_content = generate_blender_script_template(
-        pose_data, 
-        args.object_name, 
-        args.input,
-        camera_K
-    )
-    
-    # Calculate final filtered count for summary
-    filtered_pose_data = filter_reliable_poses(pose_data)
-    filtered_count = len(filtered_pose_data)
-    
-    # Write script file
+    original_count = len(frames)
+    
+    # Write script file (streamed straight to disk through a 1 MiB buffer)
     try:
-        with open(args.output, 'w') as f:
-            f.write(script_content)
+        with open(args.output, 'w', buffering=1 << 20) as f:
+            filtered_frames, filtered_poses, filtered_scene_stats = write_blender_script(
+                f,
+                frames,
+                poses,
+                args.object_name, 
+                args.input,
+                camera_K
+            )
+        
+        # Summarize from the filtered data the script was written with
+        filtered_count = len(filtered_frames)
         
         print(f"✅ FIXED standalone Blender script created: {args.output}")
         print(f"📊 Script contains:")
         print(f"   📈 {filtered_count} reliable pose matrices (filtered from {original_count} original)")
-        print(f"   🎬 Frame range: {filtered_pose_data[0][0]} to {filtered_pose_data[-1][0]}")
+        print(f"   🎬 Frame range: {filtered_frames[0]} to {filtered_frames[-1]}")
         
-        # Calculate filtered scene stats for display
-        filtered_scene_stats = calculate_scene_bounds(filtered_pose_data)
         print(f"   📏 Distance range: {filtered_scene_stats['min_distance']:.2f}m - {filtered_scene_stats['max_distance']:.2f}m")
         print(f"   📁 Size: {os.path.getsize(args.output) / 1024:.1f} KB")
         
@@ -6,57 +6,167 @@ This script compares depth images from two directories and generates:
 - Statistical metrics (MSE, MAE, SSIM, etc.)
 - Visual comparison diagrams
 - Difference heatmaps
-- Summary report
+- Summary report (summary.json) and per-image metrics (metrics.ndjson)
 """
 
 import argparse
 import cv2
 import numpy as np
 import os
+import matplotlib
+matplotlib.use('Agg')  # Figures are only saved to disk
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
 from pathlib import Path
-from skimage.metrics import structural_similarity as ssim
-from skimage.metrics import peak_signal_noise_ratio as psnr
 import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from numpy.lib.recfunctions import structured_to_unstructured
 from tqdm import tqdm
+try:
+    import numba
+except ImportError:
+    numba = None
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
-def load_depth_image(img_path, is_reference=False):
+def read_depth_image(img_path, is_reference=False):
     """
-    Load depth image, handling different formats.
+    Decode a depth image without normalizing it (safe to call from IO threads).
     
     Args:
         img_path: Path to the depth image
         is_reference: If True, expects 16-bit grayscale. If False, expects RGB colorized depth.
     
     Returns:
-        Normalized depth array (0-1 range) and original depth values
+        Decoded single-plane image, or None if it could not be read
     """
+    if is_reference:
+        # Reference images are 16-bit grayscale: decode straight to a single plane
+        return cv2.imread(str(img_path), cv2.IMREAD_ANYDEPTH)
+    
+    # Generated images are colorized: take the luminance with cvtColor, which rounds
+    # (IMREAD_GRAYSCALE uses libpng's truncating conversion and comes out darker)
     img = cv2.imread(str(img_path), cv2.IMREAD_UNCHANGED)
+    if img is not None and img.ndim == 3:
+        code = cv2.COLOR_BGRA2GRAY if img.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+        img = cv2.cvtColor(img, code)
+    return img
+
+
+def load_depth_image(img_path, is_reference=False, target_shape=None, img=None):
+    """
+    Load depth image, handling different formats.
+    
+    Args:
+        img_path: Path to the depth image
+        is_reference: If True, expects 16-bit grayscale. If False, expects RGB colorized depth.
+        target_shape: Optional (height, width) to resize to, applied to the decoded integer image
+        img: Optional image already decoded by read_depth_image; img_path is read when None
+    
+    Returns:
+        Normalized float32 depth array (0-1 range) and the decoded image with original depth values
+    """
+    if img is None:
+        img = read_depth_image(img_path, is_reference)
     
     if img is None:
         return None, None
     
+    # Resize once, on the 8/16-bit image rather than the float32 one
+    if target_shape is not None and img.shape[:2] != tuple(target_shape[:2]):
+        height, width = target_shape[:2]
+        interpolation = cv2.INTER_AREA if height < img.shape[0] else cv2.INTER_LINEAR
+        img = cv2.resize(img, (width, height), interpolation=interpolation)
+    
+    # Single float32 buffer, normalized to 0-1 range in place
+    depth = img.astype(np.float32)
     if is_reference:
         # Reference images are 16-bit grayscale
-        depth = img.astype(np.float32)
-        # Normalize to 0-1 range
-        depth_normalized = depth / depth.max() if depth.max() > 0 else depth
-        return depth_normalized, depth
+        scale = float(img.max())
     else:
-        # Generated images are RGB colorized depth maps
-        # Convert RGB to grayscale
-        if len(img.shape) == 3:
-            # Convert RGB to grayscale (using luminance formula)
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = img
-        
-        depth = gray.astype(np.float32)
-        # Normalize to 0-1 range
-        depth_normalized = depth / 255.0 if depth.max() > 0 else depth
-        return depth_normalized, depth
+        # Generated images are RGB colorized depth maps, already decoded as grayscale
+        scale = 255.0
+    if scale > 0:
+        np.divide(depth, scale, out=depth)
+    return depth, img
+
+
+def _stats_numpy(a, b):
+    """
+    Sums behind all pixel-wise metrics of two equally sized 1-D arrays, in float64.
+    
+    Returns:
+        Tuple of (sum d^2, sum |d|, sum a, sum b, sum a^2, sum b^2, sum ab, n) with d = a - b
+    """
+    a = a.astype(np.float64)
+    b = b.astype(np.float64)
+    d = a - b
+    return (np.dot(d, d), np.abs(d).sum(), a.sum(), b.sum(),
+            np.dot(a, a), np.dot(b, b), np.dot(a, b), a.size)
+
+
+if numba is not None:
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _stats(a, b):
+        """Single-pass, multithreaded version of _stats_numpy"""
+        s_d2 = 0.0
+        s_abs = 0.0
+        s_x = 0.0
+        s_y = 0.0
+        s_x2 = 0.0
+        s_y2 = 0.0
+        s_xy = 0.0
+        for i in numba.prange(a.size):
+            x = np.float64(a[i])
+            y = np.float64(b[i])
+            d = x - y
+            s_d2 += d * d
+            s_abs += abs(d)
+            s_x += x
+            s_y += y
+            s_x2 += x * x
+            s_y2 += y * y
+            s_xy += x * y
+        return s_d2, s_abs, s_x, s_y, s_x2, s_y2, s_xy, a.size
+else:
+    _stats = _stats_numpy
+
+
+def _ssim_cv2(img1, img2, data_range=1.0, win_size=7, K1=0.01, K2=0.03):
+    """
+    Mean structural similarity using OpenCV box filters.
+    
+    Same definition as skimage.metrics.structural_similarity with its defaults
+    (uniform window, sample covariance, border of win_size//2 excluded from the mean).
+    """
+    x = img1.astype(np.float32, copy=False)
+    y = img2.astype(np.float32, copy=False)
+    ksize = (win_size, win_size)
+    
+    def local_mean(img):
+        return cv2.boxFilter(img, -1, ksize, borderType=cv2.BORDER_REFLECT)
+    
+    ux = local_mean(x)
+    uy = local_mean(y)
+    uxx = local_mean(x * x)
+    uyy = local_mean(y * y)
+    uxy = local_mean(x * y)
+    
+    cov_norm = win_size * win_size / (win_size * win_size - 1)
+    vx = cov_norm * (uxx - ux * ux)
+    vy = cov_norm * (uyy - uy * uy)
+    vxy = cov_norm * (uxy - ux * uy)
+    
+    C1 = (K1 * data_range) ** 2
+    C2 = (K2 * data_range) ** 2
+    ssim_map = ((2 * ux * uy + C1) * (2 * vxy + C2)) / ((ux * ux + uy * uy + C1) * (vx + vy + C2))
+    
+    pad = (win_size - 1) // 2
+    return ssim_map[pad:-pad, pad:-pad].mean(dtype=np.float64)
 
 
 def calculate_metrics(depth1, depth2):
@@ -64,23 +174,20 @@ def calculate_metrics(depth1, depth2):
     Calculate various comparison metrics between two depth images.
     
     Args:
-        depth1: First depth image (normalized 0-1)
-        depth2: Second depth image (normalized 0-1)
+        depth1: First depth image (normalized 0-1, finite)
+        depth2: Second depth image (normalized 0-1, finite), same shape as depth1
     
     Returns:
         Dictionary of metrics
     """
-    # Ensure same shape
-    if depth1.shape != depth2.shape:
-        # Resize depth2 to match depth1
-        depth2 = cv2.resize(depth2, (depth1.shape[1], depth1.shape[0]), interpolation=cv2.INTER_LINEAR)
-    
-    # Flatten for some calculations
-    flat1 = depth1.flatten()
-    flat2 = depth2.flatten()
-    
-    # Remove invalid pixels (zeros or NaNs)
-    valid_mask = (flat1 > 0) & (flat2 > 0) & ~np.isnan(flat1) & ~np.isnan(flat2)
+    # Flat views (no copies) for some calculations
+    flat1 = depth1.ravel()
+    flat2 = depth2.ravel()
+    
+    # Remove invalid pixels (zeros). Depths decoded from PNG are finite, and any NaN
+    # would fail the > 0 comparison anyway, so no separate isnan pass is needed
+    valid_mask = np.greater(flat1, 0)
+    np.logical_and(valid_mask, np.greater(flat2, 0), out=valid_mask)
     valid1 = flat1[valid_mask]
     valid2 = flat2[valid_mask]
     
@@ -96,37 +203,40 @@ def calculate_metrics(depth1, depth2):
             'total_pixels': len(flat1)
         }
     
+    # All error and correlation metrics derive from one set of sums
+    s_d2, s_abs, s_x, s_y, s_x2, s_y2, s_xy, n = _stats(valid1, valid2)
+    
     # Mean Squared Error
-    mse = np.mean((valid1 - valid2) ** 2)
+    mse = s_d2 / n
     
     # Mean Absolute Error
-    mae = np.mean(np.abs(valid1 - valid2))
+    mae = s_abs / n
     
     # Root Mean Squared Error
     rmse = np.sqrt(mse)
     
     # Structural Similarity Index
     try:
-        # Reshape masks back to image shape
+        # Reshape masks back to image shape; one np.where pass per image zeroes invalid pixels
         mask_2d = valid_mask.reshape(depth1.shape)
-        ref_masked = depth1.copy()
-        gen_masked = depth2.copy()
-        ref_masked[~mask_2d] = 0
-        gen_masked[~mask_2d] = 0
-        ssim_value = ssim(ref_masked, gen_masked, data_range=1.0)
-        if np.isnan(ssim_value):
-            ssim_value = None
+        ref_masked = np.where(mask_2d, depth1, np.float32(0))
+        gen_masked = np.where(mask_2d, depth2, np.float32(0))
+        ssim_value = _ssim_cv2(ref_masked, gen_masked, data_range=1.0)
     except Exception as e:
-        ssim_value = None
+        ssim_value = np.nan
     
-    # Peak Signal-to-Noise Ratio
-    try:
-        psnr_value = psnr(valid1, valid2, data_range=1.0)
-    except:
-        psnr_value = np.nan
+    # Peak Signal-to-Noise Ratio (data range 1.0)
+    psnr_value = 10 * np.log10(1.0 / mse) if mse > 0 else np.inf
     
-    # Correlation coefficient
-    correlation = np.corrcoef(valid1, valid2)[0, 1] if len(valid1) > 1 else np.nan
+    # Correlation coefficient (Pearson); undefined (None) when either image is constant.
+    # Rounding in the raw sums leaves a tiny nonzero variance for constant images,
+    # so variances below a relative tolerance count as zero
+    correlation = np.nan
+    if n > 1:
+        var_x = n * s_x2 - s_x * s_x
+        var_y = n * s_y2 - s_y * s_y
+        if var_x > 1e-12 * n * s_x2 and var_y > 1e-12 * n * s_y2:
+            correlation = (n * s_xy - s_x * s_y) / np.sqrt(var_x * var_y)
     
     return {
         'mse': float(mse),
@@ -140,60 +250,102 @@ def calculate_metrics(depth1, depth2):
     }
 
 
-def create_comparison_visualization(img1, img2, diff, metrics, output_path):
+class ComparisonRenderer:
     """
-    Create a comprehensive visualization comparing two depth images.
+    Reusable figure for per-image depth comparison plots.
     
-    Args:
-        img1: First depth image
-        img2: Second depth image
-        diff: Difference image
-        metrics: Dictionary of metrics
-        output_path: Path to save the visualization
+    The figure, image artists, colorbars and metrics text are created once;
+    render() only swaps in the new data and saves, instead of rebuilding the
+    whole figure for every image pair.
     """
-    fig, axes = plt.subplots(2, 3, figsize=(18, 12))
-    fig.suptitle('Depth Image Comparison', fontsize=16, fontweight='bold')
-    
-    # Original depth (reference)
-    im1 = axes[0, 0].imshow(img1, cmap='viridis', vmin=0, vmax=1)
-    axes[0, 0].set_title('Reference Depth (16-bit grayscale)', fontsize=12)
-    axes[0, 0].axis('off')
-    plt.colorbar(im1, ax=axes[0, 0], fraction=0.046)
-    
-    # Generated depth
-    im2 = axes[0, 1].imshow(img2, cmap='viridis', vmin=0, vmax=1)
-    axes[0, 1].set_title('Generated Depth (RGB colorized)', fontsize=12)
-    axes[0, 1].axis('off')
-    plt.colorbar(im2, ax=axes[0, 1], fraction=0.046)
-    
-    # Absolute difference
-    im3 = axes[0, 2].imshow(np.abs(diff), cmap='hot', vmin=0, vmax=1)
-    axes[0, 2].set_title('Absolute Difference', fontsize=12)
-    axes[0, 2].axis('off')
-    plt.colorbar(im3, ax=axes[0, 2], fraction=0.046)
-    
-    # Difference heatmap
-    im4 = axes[1, 0].imshow(diff, cmap='RdBu_r', vmin=-1, vmax=1)
-    axes[1, 0].set_title('Difference (Reference - Generated)', fontsize=12)
-    axes[1, 0].axis('off')
-    plt.colorbar(im4, ax=axes[1, 0], fraction=0.046)
-    
-    # Histogram comparison
-    axes[1, 1].hist(img1.flatten(), bins=50, alpha=0.5, label='Reference', color='blue', density=True)
-    axes[1, 1].hist(img2.flatten(), bins=50, alpha=0.5, label='Generated', color='red', density=True)
-    axes[1, 1].set_title('Depth Value Distribution', fontsize=12)
-    axes[1, 1].set_xlabel('Normalized Depth Value')
-    axes[1, 1].set_ylabel('Density')
-    axes[1, 1].legend()
-    axes[1, 1].grid(True, alpha=0.3)
-    
-    # Metrics text
-    axes[1, 2].axis('off')
-    ssim_str = f"{metrics['ssim']:.4f}" if metrics['ssim'] is not None else 'N/A'
-    psnr_str = f"{metrics['psnr']:.2f}" if metrics['psnr'] is not None else 'N/A'
-    corr_str = f"{metrics['correlation']:.4f}" if metrics['correlation'] is not None else 'N/A'
-    
-    metrics_text = f"""
+    
+    def __init__(self):
+        self.fig, axes = plt.subplots(2, 3, figsize=(18, 12))
+        self.fig.suptitle('Depth Image Comparison', fontsize=16, fontweight='bold')
+        placeholder = np.zeros((1, 1), dtype=np.float32)
+        
+        # Original depth (reference)
+        self.im_ref = axes[0, 0].imshow(placeholder, cmap='viridis', vmin=0, vmax=1)
+        axes[0, 0].set_title('Reference Depth (16-bit grayscale)', fontsize=12)
+        axes[0, 0].axis('off')
+        plt.colorbar(self.im_ref, ax=axes[0, 0], fraction=0.046)
+        
+        # Generated depth
+        self.im_gen = axes[0, 1].imshow(placeholder, cmap='viridis', vmin=0, vmax=1)
+        axes[0, 1].set_title('Generated Depth (RGB colorized)', fontsize=12)
+        axes[0, 1].axis('off')
+        plt.colorbar(self.im_gen, ax=axes[0, 1], fraction=0.046)
+        
+        # Absolute difference
+        self.im_absdiff = axes[0, 2].imshow(placeholder, cmap='hot', vmin=0, vmax=1)
+        axes[0, 2].set_title('Absolute Difference', fontsize=12)
+        axes[0, 2].axis('off')
+        plt.colorbar(self.im_absdiff, ax=axes[0, 2], fraction=0.046)
+        
+        # Difference heatmap
+        self.im_diff = axes[1, 0].imshow(placeholder, cmap='RdBu_r', vmin=-1, vmax=1)
+        axes[1, 0].set_title('Difference (Reference - Generated)', fontsize=12)
+        axes[1, 0].axis('off')
+        plt.colorbar(self.im_diff, ax=axes[1, 0], fraction=0.046)
+        
+        # Histogram comparison over fixed 0-1 bins (step patches updated per image)
+        self.hist_ax = axes[1, 1]
+        self.hist_bins = np.linspace(0, 1, 51)
+        empty = np.zeros(len(self.hist_bins) - 1)
+        self.hist_ref = self.hist_ax.stairs(empty, self.hist_bins, fill=True, alpha=0.5,
+                                            label='Reference', color='blue')
+        self.hist_gen = self.hist_ax.stairs(empty, self.hist_bins, fill=True, alpha=0.5,
+                                            label='Generated', color='red')
+        self.hist_ax.set_title('Depth Value Distribution', fontsize=12)
+        self.hist_ax.set_xlabel('Normalized Depth Value')
+        self.hist_ax.set_ylabel('Density')
+        self.hist_ax.legend()
+        self.hist_ax.grid(True, alpha=0.3)
+        
+        # Metrics text
+        axes[1, 2].axis('off')
+        self.metrics_text = axes[1, 2].text(0.1, 0.5, '', fontsize=11, family='monospace',
+                                            verticalalignment='center',
+                                            bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
+        
+        self._image_shape = None
+    
+    def _update_histograms(self, img1, img2):
+        for patch, img in ((self.hist_ref, img1), (self.hist_gen, img2)):
+            density, _ = np.histogram(img.ravel(), bins=self.hist_bins, density=True)
+            patch.set_data(values=density)
+        self.hist_ax.relim()
+        self.hist_ax.autoscale_view()
+    
+    def render(self, img1, img2, diff, metrics, output_path):
+        """
+        Draw one image pair into the shared figure and save it.
+        
+        Args:
+            img1: First depth image
+            img2: Second depth image
+            diff: Difference image
+            metrics: Dictionary of metrics
+            output_path: Path to save the visualization
+        """
+        images = (self.im_ref, self.im_gen, self.im_absdiff, self.im_diff)
+        for im, data in zip(images, (img1, img2, np.abs(diff), diff)):
+            im.set_data(data)
+        self._update_histograms(img1, img2)
+        
+        # Only touch extents (and axis limits) when the image size changes
+        if img1.shape != self._image_shape:
+            height, width = img1.shape[:2]
+            for im in images:
+                im.set_extent((-0.5, width - 0.5, height - 0.5, -0.5))
+            self._image_shape = img1.shape
+            self.fig.tight_layout()
+        
+        ssim_str = f"{metrics['ssim']:.4f}" if metrics['ssim'] is not None else 'N/A'
+        psnr_str = f"{metrics['psnr']:.2f}" if metrics['psnr'] is not None else 'N/A'
+        corr_str = f"{metrics['correlation']:.4f}" if metrics['correlation'] is not None else 'N/A'
+        
+        self.metrics_text.set_text(f"""
     Comparison Metrics:
     
     MSE:  {metrics['mse']:.6f}
@@ -207,16 +359,184 @@ def create_comparison_visualization(img1, img2, diff, metrics, output_path):
     
     Valid Pixels: {metrics['valid_pixels']:,} / {metrics['total_pixels']:,}
     Coverage: {100*metrics['valid_pixels']/metrics['total_pixels']:.1f}%
+    """)
+        
+        # DEFLATE level 1 instead of the default 6: much faster for slightly larger files
+        self.fig.savefig(output_path, dpi=150, pil_kwargs={'compress_level': 1})
+    
+    def close(self):
+        plt.close(self.fig)
+
+
+def create_comparison_visualization(img1, img2, diff, metrics, output_path):
     """
-    axes[1, 2].text(0.1, 0.5, metrics_text, fontsize=11, family='monospace',
-                    verticalalignment='center', bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
+    Create a comprehensive visualization comparing two depth images.
     
-    plt.tight_layout()
-    plt.savefig(output_path, dpi=150, bbox_inches='tight')
-    plt.close()
+    For many image pairs, reuse one ComparisonRenderer instead.
+    
+    Args:
+        img1: First depth image
+        img2: Second depth image
+        diff: Difference image
+        metrics: Dictionary of metrics
+        output_path: Path to save the visualization
+    """
+    renderer = ComparisonRenderer()
+    try:
+        renderer.render(img1, img2, diff, metrics, output_path)
+    finally:
+        renderer.close()
+
 
+# Per-image metrics as one structured array row: floating metrics (NaN when
+# unavailable) followed by the pixel counts
+METRIC_NAMES = ('mse', 'mae', 'rmse', 'ssim', 'psnr', 'correlation')
+METRICS_DTYPE = np.dtype([(name, np.float64) for name in METRIC_NAMES] +
+                         [('valid_pixels', np.int64), ('total_pixels', np.int64)])
 
-def compare_directories(ref_dir, gen_dir, output_dir, sample_size=None):
+# Number of image pairs decoded ahead of the one being compared
+PREFETCH_DEPTH = 4
+
+# Per-process comparison figure, created by _init_worker
+_worker_renderer = None
+
+
+def _init_worker(pin_threads=True):
+    """
+    Per-process setup: a private figure and, in pool workers, single-threaded
+    OpenCV and Numba (parallelism comes from the pool).
+    
+    Args:
+        pin_threads: False when comparing in the caller's process, whose threading is left alone
+    """
+    global _worker_renderer
+    if pin_threads:
+        cv2.setNumThreads(1)
+        if numba is not None:
+            numba.set_num_threads(1)
+    _worker_renderer = ComparisonRenderer()
+
+
+def _close_worker():
+    """Close the figure created by _init_worker."""
+    global _worker_renderer
+    _worker_renderer.close()
+    _worker_renderer = None
+
+
+def _read_pair(task):
+    """Decode the reference and generated images of a task (run in the prefetch threads)."""
+    ref_img_path, gen_img_path, _ = task
+    return read_depth_image(ref_img_path, is_reference=True), read_depth_image(gen_img_path, is_reference=False)
+
+
+def _compare_one(task, images=(None, None)):
+    """
+    Compare one image pair and save its visualization.
+    
+    Args:
+        task: Tuple of (reference image path, generated image path, visualization path)
+        images: Optional (reference, generated) images already decoded by _read_pair
+    
+    Returns:
+        Tuple of (filename, metrics record matching METRICS_DTYPE), with the record None if the pair failed
+    """
+    ref_img_path, gen_img_path, vis_path = task
+    filename = os.path.basename(ref_img_path)
+    ref_img, gen_img = images
+    
+    try:
+        # Load images (generated one resized to the reference shape if needed)
+        ref_normalized, ref_raw = load_depth_image(ref_img_path, is_reference=True, img=ref_img)
+        if ref_normalized is None:
+            return filename, None
+        gen_normalized, gen_raw = load_depth_image(gen_img_path, is_reference=False,
+                                                   target_shape=ref_normalized.shape, img=gen_img)
+        
+        if gen_normalized is None:
+            return filename, None
+        
+        # Calculate metrics
+        metrics = calculate_metrics(ref_normalized, gen_normalized)
+        metrics['filename'] = filename
+        
+        # Calculate difference
+        diff = ref_normalized - gen_normalized
+        
+        # Create visualization
+        _worker_renderer.render(ref_normalized, gen_normalized, diff, metrics, vis_path)
+        record = tuple(np.nan if metrics[name] is None else metrics[name] for name in METRIC_NAMES)
+        return filename, record + (metrics['valid_pixels'], metrics['total_pixels'])
+        
+    except Exception as e:
+        print(f"Error processing {filename}: {e}")
+        return filename, None
+
+
+def _iter_compare(tasks):
+    """
+    Compare tasks in order, decoding the next PREFETCH_DEPTH pairs in threads
+    (cv2.imread releases the GIL) while the current pair is measured and rendered.
+    
+    Yields:
+        The _compare_one result for each task
+    """
+    with ThreadPoolExecutor(max_workers=PREFETCH_DEPTH) as pool:
+        in_flight = deque(pool.submit(_read_pair, task) for task in tasks[:PREFETCH_DEPTH])
+        for i, task in enumerate(tasks):
+            future = in_flight.popleft()
+            if i + PREFETCH_DEPTH < len(tasks):
+                in_flight.append(pool.submit(_read_pair, tasks[i + PREFETCH_DEPTH]))
+            try:
+                images = future.result()
+            except Exception:
+                images = (None, None)  # _compare_one retries the read and reports the error
+            yield _compare_one(task, images)
+
+
+def _compare_chunk(tasks):
+    """Compare a chunk of tasks in a worker process (see _iter_compare)."""
+    return list(_iter_compare(tasks))
+
+
+def json_value(value):
+    """
+    Make a metric value valid, encoder-independent JSON.
+    
+    NaN (metric unavailable) becomes None and infinities (e.g. PSNR of identical
+    images) become the strings "inf"/"-inf", which orjson and json would otherwise
+    write as null and as the non-standard Infinity respectively.
+    """
+    if isinstance(value, float) and not np.isfinite(value):
+        return None if np.isnan(value) else ('inf' if value > 0 else '-inf')
+    return value
+
+
+def metrics_to_dicts(metrics_arr, filenames):
+    """Convert a METRICS_DTYPE array to per-image dicts of JSON-ready values (see json_value)."""
+    all_metrics = []
+    for row, filename in zip(metrics_arr.tolist(), filenames):
+        metrics = {name: json_value(value) for name, value in zip(METRIC_NAMES, row)}
+        metrics['valid_pixels'], metrics['total_pixels'] = row[-2:]
+        metrics['filename'] = filename
+        all_metrics.append(metrics)
+    return all_metrics
+
+
+def dumps_json(obj, indent=False):
+    """Encode obj as UTF-8 JSON bytes, using orjson when it is installed (values must be finite, see json_value)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, indent=2 if indent else None, allow_nan=False).encode('utf-8')
+
+
+def list_png_files(directory):
+    """Sorted names of the .png files in directory."""
+    with os.scandir(directory) as entries:
+        return sorted(entry.name for entry in entries if entry.name.endswith('.png') and entry.is_file())
+
+
+def compare_directories(ref_dir, gen_dir, output_dir, sample_size=None, num_workers=None):
     """
     Compare depth images from two directories.
     
@@ -225,88 +545,89 @@ def compare_directories(ref_dir, gen_dir, output_dir, sample_size=None):
         gen_dir: Directory containing generated depth images
         output_dir: Directory to save comparison results
         sample_size: Number of images to compare (None for all)
+        num_workers: Number of worker processes (None for all CPUs, 1 to run in-process)
     """
-    ref_path = Path(ref_dir)
-    gen_path = Path(gen_dir)
     output_path = Path(output_dir)
     
     output_path.mkdir(parents=True, exist_ok=True)
     
     # Get list of common files
-    ref_files = set([f.name for f in ref_path.glob('*.png')])
-    gen_files = set([f.name for f in gen_path.glob('*.png')])
-    common_files = sorted(list(ref_files & gen_files))
+    gen_files = set(list_png_files(gen_dir))
+    common_files = [name for name in list_png_files(ref_dir) if name in gen_files]
     
     if sample_size:
         common_files = common_files[:sample_size]
     
     print(f"Found {len(common_files)} common depth images to compare")
     
-    all_metrics = []
+    compared_files = []
     failed_files = []
     
     # Create comparison directory
     comparison_dir = output_path / 'comparisons'
     comparison_dir.mkdir(exist_ok=True)
     
-    # Process each image pair
-    for filename in tqdm(common_files, desc="Comparing images"):
-        ref_img_path = ref_path / filename
-        gen_img_path = gen_path / filename
-        
+    tasks = [(os.path.join(ref_dir, filename),
+              os.path.join(gen_dir, filename),
+              os.path.join(comparison_dir, f"{filename[:-len('.png')]}_comparison.png"))
+             for filename in common_files]
+    num_workers = num_workers or os.cpu_count() or 1
+    
+    # Process image pairs (independent of each other) in parallel, keeping file order;
+    # each worker prefetches the images of its chunk while comparing
+    if num_workers > 1 and len(tasks) > 1:
+        chunksize = max(1, len(tasks) // (num_workers * 4))
+        chunks = [tasks[i:i + chunksize] for i in range(0, len(tasks), chunksize)]
+        results = []
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_worker) as executor, \
+                tqdm(total=len(tasks), desc="Comparing images") as progress:
+            for chunk_results in executor.map(_compare_chunk, chunks):
+                results.extend(chunk_results)
+                progress.update(len(chunk_results))
+    else:
+        _init_worker(pin_threads=False)
         try:
-            # Load images
-            ref_normalized, ref_raw = load_depth_image(ref_img_path, is_reference=True)
-            gen_normalized, gen_raw = load_depth_image(gen_img_path, is_reference=False)
-            
-            if ref_normalized is None or gen_normalized is None:
-                failed_files.append(filename)
-                continue
-            
-            # Calculate metrics
-            metrics = calculate_metrics(ref_normalized, gen_normalized)
-            metrics['filename'] = filename
-            all_metrics.append(metrics)
-            
-            # Calculate difference
-            if ref_normalized.shape != gen_normalized.shape:
-                gen_normalized = cv2.resize(gen_normalized, 
-                                           (ref_normalized.shape[1], ref_normalized.shape[0]),
-                                           interpolation=cv2.INTER_LINEAR)
-            
-            diff = ref_normalized - gen_normalized
-            
-            # Create visualization
-            vis_path = comparison_dir / f"{Path(filename).stem}_comparison.png"
-            create_comparison_visualization(ref_normalized, gen_normalized, diff, metrics, vis_path)
-            
-        except Exception as e:
-            print(f"Error processing {filename}: {e}")
+            results = list(tqdm(_iter_compare(tasks), total=len(tasks), desc="Comparing images"))
+        finally:
+            _close_worker()
+    
+    records = []
+    for filename, record in results:
+        if record is None:
             failed_files.append(filename)
+        else:
+            compared_files.append(filename)
+            records.append(record)
+    
+    # One column per metric instead of a list of per-image dicts
+    metrics_arr = np.array(records, dtype=METRICS_DTYPE)
     
     # Calculate aggregate statistics
-    if all_metrics:
+    if len(metrics_arr):
         aggregate = {
-            'total_images': len(all_metrics),
+            'total_images': len(metrics_arr),
             'failed_images': len(failed_files),
-            'mean_mse': np.nanmean([m['mse'] for m in all_metrics if m['mse'] is not None]),
-            'mean_mae': np.nanmean([m['mae'] for m in all_metrics if m['mae'] is not None]),
-            'mean_rmse': np.nanmean([m['rmse'] for m in all_metrics if m['rmse'] is not None]),
-            'mean_ssim': np.nanmean([m['ssim'] for m in all_metrics if m['ssim'] is not None]),
-            'mean_psnr': np.nanmean([m['psnr'] for m in all_metrics if m['psnr'] is not None]),
-            'mean_correlation': np.nanmean([m['correlation'] for m in all_metrics if m['correlation'] is not None]),
         }
+        # All metric columns as one (N, 6) array, so every mean comes from a single nanmean
+        metric_values = structured_to_unstructured(metrics_arr[list(METRIC_NAMES)])
+        for name, mean in zip(METRIC_NAMES, np.nanmean(metric_values, axis=0).tolist()):
+            aggregate[f'mean_{name}'] = mean
         
         # Create summary visualization
-        create_summary_visualization(all_metrics, aggregate, output_path / 'summary_statistics.png')
+        create_summary_visualization(metrics_arr, aggregate, output_path / 'summary_statistics.png')
         
-        # Save detailed metrics JSON
-        with open(output_path / 'detailed_metrics.json', 'w') as f:
-            json.dump({
-                'aggregate': aggregate,
-                'per_image': all_metrics,
+        # Per-image dicts are only built for the NDJSON report
+        all_metrics = metrics_to_dicts(metrics_arr, compared_files)
+        
+        # Save per-image metrics as NDJSON (one compact object per line) and a small summary
+        with open(output_path / 'metrics.ndjson', 'wb') as f:
+            for metrics in all_metrics:
+                f.write(dumps_json(metrics) + b'\n')
+        with open(output_path / 'summary.json', 'wb') as f:
+            f.write(dumps_json({
+                'aggregate': {key: json_value(value) for key, value in aggregate.items()},
                 'failed_files': failed_files
-            }, f, indent=2)
+            }, indent=True))
         
         # Print summary
         print("\n" + "="*60)
@@ -339,16 +660,20 @@ def compare_directories(ref_dir, gen_dir, output_dir, sample_size=None):
         print("No images were successfully compared!")
 
 
-def create_summary_visualization(all_metrics, aggregate, output_path):
-    """Create a summary visualization of all comparison metrics."""
+def create_summary_visualization(metrics_arr, aggregate, output_path):
+    """Create a summary visualization of all comparison metrics (a METRICS_DTYPE array)."""
     fig, axes = plt.subplots(2, 2, figsize=(15, 12))
     fig.suptitle('Depth Image Comparison - Summary Statistics', fontsize=16, fontweight='bold')
     
-    # Extract metrics
-    mse_values = [m['mse'] for m in all_metrics if m['mse'] is not None]
-    mae_values = [m['mae'] for m in all_metrics if m['mae'] is not None]
-    ssim_values = [m['ssim'] for m in all_metrics if m['ssim'] is not None]
-    correlation_values = [m['correlation'] for m in all_metrics if m['correlation'] is not None]
+    # Extract metric columns, dropping unavailable (NaN) values
+    def available(name):
+        values = metrics_arr[name]
+        return values[~np.isnan(values)]
+    
+    mse_values = available('mse')
+    mae_values = available('mae')
+    ssim_values = available('ssim')
+    correlation_values = available('correlation')
     
     # MSE distribution
     axes[0, 0].hist(mse_values, bins=30, edgecolor='black', alpha=0.7)
@@ -369,7 +694,7 @@ def create_summary_visualization(all_metrics, aggregate, output_path):
     axes[0, 1].grid(True, alpha=0.3)
     
     # SSIM distribution
-    if ssim_values:
+    if len(ssim_values):
         axes[1, 0].hist(ssim_values, bins=30, edgecolor='black', alpha=0.7, color='green')
         axes[1, 0].axvline(aggregate['mean_ssim'], color='red', linestyle='--', linewidth=2, label=f'Mean: {aggregate["mean_ssim"]:.4f}')
         axes[1, 0].set_title('SSIM Distribution', fontsize=12)
@@ -379,7 +704,7 @@ def create_summary_visualization(all_metrics, aggregate, output_path):
         axes[1, 0].grid(True, alpha=0.3)
     
     # Correlation distribution
-    if correlation_values:
+    if len(correlation_values):
         axes[1, 1].hist(correlation_values, bins=30, edgecolor='black', alpha=0.7, color='purple')
         axes[1, 1].axvline(aggregate['mean_correlation'], color='red', linestyle='--', linewidth=2, label=f'Mean: {aggregate["mean_correlation"]:.4f}')
         axes[1, 1].set_title('Correlation Distribution', fontsize=12)
@@ -403,6 +728,8 @@ def main():
                        help='Output directory for comparison results')
     parser.add_argument('--sample-size', type=int, default=None,
                        help='Number of images to compare (None for all)')
+    parser.add_argument('--num-workers', type=int, default=None,
+                       help='Number of worker processes (default: all CPUs, 1 to disable multiprocessing)')
     
     args = parser.parse_args()
     
@@ -410,7 +737,8 @@ def main():
         ref_dir=args.ref_dir,
         gen_dir=args.gen_dir,
         output_dir=args.output_dir,
-        sample_size=args.sample_size
+        sample_size=args.sample_size,
+        num_workers=args.num_workers
     )
 
 